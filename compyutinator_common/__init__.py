@@ -2,36 +2,62 @@
 
 __version__ = "0.1.0"
 
-from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import Qt
+# Qt is imported inside the functions below so that importing this package
+# (e.g. for --help) does not pay the PyQt6 load cost.
+
+_APP = None
 
 def get_app():
     """Get or create QApplication instance."""
-    app = QApplication.instance()
-    if app is None:
-        app = QApplication([])
-    return app
+    global _APP
+    if _APP is None:
+        from PyQt6.QtWidgets import QApplication
+        _APP = QApplication.instance() or QApplication([])
+    return _APP
+
+# (color role, global color) pairs making up the dark theme
+_DARK_PALETTE_SPEC = (
+    ("Window", "black"),
+    ("WindowText", "white"),
+    ("Base", "darkGray"),
+    ("AlternateBase", "darkGray"),
+    ("ToolTipBase", "black"),
+    ("ToolTipText", "white"),
+    ("Text", "white"),
+    ("Button", "darkGray"),
+    ("ButtonText", "white"),
+    ("BrightText", "red"),
+    ("Link", "cyan"),
+    ("Highlight", "darkCyan"),
+    ("HighlightedText", "black"),
+)
+
+def _build_dark_palette():
+    """Build the dark theme palette shared by all Compyutinator apps."""
+    from PyQt6.QtCore import Qt
+    from PyQt6.QtGui import QColor, QPalette
+    palette = QPalette()
+    roles = QPalette.ColorRole
+    colors = Qt.GlobalColor
+    set_color = palette.setColor
+    for role, color in _DARK_PALETTE_SPEC:
+        set_color(getattr(roles, role), QColor(getattr(colors, color)))
+    return palette
+
+_styled = False
 
 def setup_qt_app():
     """Set up and return a QApplication instance with proper settings."""
-    app = QApplication([])
+    global _styled
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    if _styled:
+        return app
+    
     app.setStyle('Fusion')  # Use Fusion style for consistent look
     
-    # Set dark theme palette
-    palette = app.palette()
-    palette.setColor(palette.ColorRole.Window, Qt.GlobalColor.black)
-    palette.setColor(palette.ColorRole.WindowText, Qt.GlobalColor.white)
-    palette.setColor(palette.ColorRole.Base, Qt.GlobalColor.darkGray)
-    palette.setColor(palette.ColorRole.AlternateBase, Qt.GlobalColor.darkGray)
-    palette.setColor(palette.ColorRole.ToolTipBase, Qt.GlobalColor.black)
-    palette.setColor(palette.ColorRole.ToolTipText, Qt.GlobalColor.white)
-    palette.setColor(palette.ColorRole.Text, Qt.GlobalColor.white)
-    palette.setColor(palette.ColorRole.Button, Qt.GlobalColor.darkGray)
-    palette.setColor(palette.ColorRole.ButtonText, Qt.GlobalColor.white)
-    palette.setColor(palette.ColorRole.BrightText, Qt.GlobalColor.red)
-    palette.setColor(palette.ColorRole.Link, Qt.GlobalColor.cyan)
-    palette.setColor(palette.ColorRole.Highlight, Qt.GlobalColor.darkCyan)
-    palette.setColor(palette.ColorRole.HighlightedText, Qt.GlobalColor.black)
-    app.setPalette(palette)
+    # Set dark theme palette (only once, guarded by _styled)
+    app.setPalette(_build_dark_palette())
     
-    return app 
\ No newline at end of file
+    _styled = True
+    return app
@@ -6,47 +6,100 @@ Main entry point for the Compyutinator Keyboard application.
 import sys
 import os
 import signal
-import argparse
-from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import QTimer
-from .keyboard_manager import KeyboardManager
-from compyutinator_common import setup_qt_app
+from types import SimpleNamespace
+
+def read_config_file(config_path):
+    """Read a config file with raw os calls, without updating its atime."""
+    flags = os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0)
+    try:
+        fd = os.open(config_path, flags | getattr(os, 'O_NOATIME', 0))
+    except PermissionError:
+        # O_NOATIME is only allowed for the file's owner
+        fd = os.open(config_path, flags)
+    try:
+        size = os.fstat(fd).st_size
+        chunks = []
+        while True:
+            chunk = os.read(fd, max(size, 4096))
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+    return b''.join(chunks).decode('utf-8')
 
 def signal_handler(signum, frame):
-    """Handle interrupt signals."""
-    print("\nReceived interrupt signal. Cleaning up...")
-    QApplication.quit()
+    """Handle interrupt signals.
 
-def main():
-    """Main entry point."""
+    Nothing is done here: CPython writes the signal number to the wakeup fd
+    and the event loop handles it, so no Qt calls happen inside the handler.
+    """
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        # Plain launch (e.g. from the desktop file): no need to import argparse
+        return SimpleNamespace(config=None, auto_start=False)
+
+    import argparse
     parser = argparse.ArgumentParser(description="Compyutinator Keyboard Manager")
     parser.add_argument('--config', '-c', type=str, help='Path to KMonad config file')
     parser.add_argument('--auto-start', '-a', action='store_true', help='Automatically start KMonad')
-    args = parser.parse_args()
+    return parser.parse_args(argv)
 
-    # Set up signal handling before creating QApplication
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+def main():
+    """Main entry point."""
+    args = parse_args()
+
+    # Defer Qt imports until arguments are parsed so --help stays fast
+    from PyQt6.QtCore import QSocketNotifier, QThreadPool, QTimer
+    from compyutinator_common import setup_qt_app
+    from .keyboard_manager import KeyboardManager
 
     app = setup_qt_app()
     
-    # Create a timer to process signals
-    timer = QTimer()
-    timer.timeout.connect(lambda: None)  # Let Python process signals
-    timer.start(50)  # Check more frequently (every 50ms)
+    # CPython writes the number of each received signal to this self-pipe;
+    # the event loop watches it instead of waking up on a timer
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_read, False)
+    os.set_blocking(wakeup_write, False)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    def handle_wakeup():
+        try:
+            signums = os.read(wakeup_read, 64)
+        except BlockingIOError:
+            return
+        if signal.SIGINT in signums or signal.SIGTERM in signums:
+            print("\nReceived interrupt signal. Cleaning up...")
+            app.quit()
+
+    wakeup_notifier = QSocketNotifier(wakeup_read, QSocketNotifier.Type.Read)
+    wakeup_notifier.activated.connect(handle_wakeup)
     
     manager = KeyboardManager()
     
-    # Load config if specified
+    # Load config if specified, on a worker thread so the window paints first
     if args.config:
-        config_path = os.path.expanduser(args.config)
-        if os.path.exists(config_path):
-            with open(config_path, 'r') as f:
-                manager.keyboard_layout.config_edit.setText(f.read())
-            if args.auto_start:
-                manager.keyboard_layout.toggle_kmonad()
+        from .config_loader import ConfigLoadSignals, ConfigLoadTask
+        keyboard_layout = manager.keyboard_layout
+        config_signals = ConfigLoadSignals()
+        config_signals.loaded.connect(keyboard_layout.config_edit.setPlainText)
+        if args.auto_start:
+            config_signals.loaded.connect(lambda _: keyboard_layout.toggle_kmonad())
+        config_signals.failed.connect(
+            lambda error: keyboard_layout.show_warning(f"Error loading config: {error}")
+        )
+        QThreadPool.globalInstance().start(
+            ConfigLoadTask(read_config_file, os.path.expanduser(args.config), config_signals)
+        )
     
-    manager.show()
+    # Show from inside the event loop so it starts pumping right away
+    QTimer.singleShot(0, manager.show)
     return app.exec()
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+"""
+Background loading of KMonad config files.
+"""
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+class ConfigLoadSignals(QObject):
+    """Signals carrying the result of a ConfigLoadTask back to the GUI thread."""
+
+    loaded = pyqtSignal(str)  # config text
+    failed = pyqtSignal(str)  # error message
+
+class ConfigLoadTask(QRunnable):
+    """Read a config file on a QThreadPool worker."""
+
+    def __init__(self, load, config_path, signals):
+        super().__init__()
+        self.load = load
+        self.config_path = config_path
+        self.signals = signals
+
+    def run(self):
+        try:
+            text = self.load(self.config_path)
+        except (OSError, UnicodeDecodeError) as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.loaded.emit(text)
@@ -4,20 +4,308 @@ Keyboard Layout Widget for visualizing and editing keyboard configurations.
 
 from PyQt6.QtWidgets import (
     QWidget, QHBoxLayout, QLabel, QVBoxLayout, QComboBox,
-    QPushButton, QTextEdit, QCheckBox, QFileDialog, QSystemTrayIcon, QMenu, QMessageBox, QSpinBox
+    QPushButton, QPlainTextEdit, QCheckBox, QFileDialog, QSystemTrayIcon, QMenu, QMessageBox, QSpinBox
 )
-from PyQt6.QtCore import Qt, QPoint, QPropertyAnimation, QEasingCurve, QMimeData, QTimer
-from PyQt6.QtGui import QPainter, QPen, QColor, QPixmap, QDrag, QIcon, QTextCursor
+from PyQt6.QtCore import (
+    Qt, QPoint, QPointF, QRectF, QSize, QPropertyAnimation, QEasingCurve, QMimeData, QTimer,
+    QObject, QRunnable, QThreadPool, QSocketNotifier, QFileSystemWatcher, pyqtSignal
+)
+from PyQt6.QtGui import (
+    QPainter, QPen, QColor, QPixmap, QDrag, QIcon, QFont, QStaticText, QTransform, QTextCursor
+)
+from dataclasses import dataclass
+from datetime import datetime
+import atexit
+import contextlib
+import functools
+import grp
 import os
+import pwd
 import re
-import subprocess
+import shutil
+import signal
+import stat
+import string
+import sys
 import tempfile
+from types import MappingProxyType
 from PyQt6.QtCore import QProcess
 from PyQt6.QtWidgets import QApplication
 
+# Patterns for parsing /proc/bus/input/devices (read as bytes)
+_NAME_RE = re.compile(rb'^N: Name="([^"]+)"', re.M)
+_HANDLERS_RE = re.compile(rb'^H: Handlers=([^\n]+)', re.M)
+_EVENT_RE = re.compile(rb'event(\d+)')
+
+# Body of the default layer in a KMonad config
+_DEFLAYER_RE = re.compile(r'\(deflayer\s+default\s+([\s\S]+?)\)')
+
+# Terminal emulators for debug_in_terminal, with the flag that runs a command
+_TERMINALS = (
+    ("konsole", ["-e"]),
+    ("gnome-terminal", ["--"]),
+    ("xterm", ["-e"]),
+    ("alacritty", ["-e"]),
+)
+
+# Predefined key rows, shared by every KeyboardLayout instance. The key
+# names are identifier-like literals, so CPython already interns them
+_FUNCTION_ROW = ("esc", "f1", "f2", "f3", "f4", "f5", "f6", "f7", "f8", "f9", "f10", "f11", "f12")
+_NUMBER_ROW = ("grv", "1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "mins", "eql", "bspc")
+_CONTROL_ROW = ("lctl", "lmet", "lalt", "spc", "ralt", "rmet", "menu", "rctl")
+
+_QWERTY_ROWS = {
+    "Function": _FUNCTION_ROW,
+    "Number": _NUMBER_ROW,
+    "QWERTY": ("tab", "q", "w", "e", "r", "t", "y", "u", "i", "o", "p", "lbrc", "rbrc", "bsls"),
+    "Home": ("caps", "a", "s", "d", "f", "g", "h", "j", "k", "l", "scln", "quot", "ret"),
+    "Shift": ("lsft", "z", "x", "c", "v", "b", "n", "m", "comm", "dot", "slsh", "rsft"),
+    "Control": _CONTROL_ROW,
+}
+
+_LAYOUTS = MappingProxyType({
+    "QWERTY": MappingProxyType(_QWERTY_ROWS),
+    "Colemak": MappingProxyType({
+        "Function": _FUNCTION_ROW,
+        "Number": _NUMBER_ROW,
+        "QWERTY": ("tab", "q", "w", "f", "p", "g", "j", "l", "u", "y", "scln", "lbrc", "rbrc", "bsls"),
+        "Home": ("caps", "a", "r", "s", "t", "d", "h", "n", "e", "i", "o", "quot", "ret"),
+        "Shift": ("lsft", "z", "x", "c", "v", "b", "k", "m", "comm", "dot", "slsh", "rsft"),
+        "Control": _CONTROL_ROW,
+    }),
+})
+
+# Keyboard rows in display order, with explicit max lengths
+_ROW_CONFIGS = (
+    MappingProxyType({"name": "Function", "length": 13}),
+    MappingProxyType({"name": "Number", "length": 14}),
+    MappingProxyType({"name": "QWERTY", "length": 14}),
+    MappingProxyType({"name": "Home", "length": 13}),
+    MappingProxyType({"name": "Shift", "length": 12}),
+    MappingProxyType({"name": "Control", "length": 8}),
+)
+
+# Row offsets for the staggered layout
+_ROW_OFFSETS = MappingProxyType({
+    "Function": 0,
+    "Number": 0,
+    "QWERTY": 25,  # Quarter key offset
+    "Home": 35,    # Third key offset
+    "Shift": 45,   # Half key offset
+    "Control": 15  # Small offset
+})
+
+_DEFSRC = r"""(defsrc
+  esc  f1   f2   f3   f4   f5   f6   f7   f8   f9   f10  f11  f12
+  grv  1    2    3    4    5    6    7    8    9    0    -    =    bspc
+  tab  q    w    e    r    t    y    u    i    o    p    [    ]    \
+  caps a    s    d    f    g    h    j    k    l    ;    '    ret
+  lsft z    x    c    v    b    n    m    ,    .    /    rsft
+  lctl lmet lalt           spc            ralt rmet menu rctl
+)
+
+(defalias
+  cap (tap-hold 200 esc lctl)
+)"""
+
+# Default KMonad configs
+_KMONAD_CONFIGS = MappingProxyType({
+    "QWERTY-Colemak": r"""
+(defcfg
+  input  (device-file "/dev/input/by-id/DEVICE_ID")
+  output (uinput-sink "My KMonad output")
+  fallthrough true
+  allow-cmd true
+)
+
+""" + _DEFSRC + r"""
+
+(deflayer colemak
+  esc  f1   f2   f3   f4   f5   f6   f7   f8   f9   f10  f11  f12
+  grv  1    2    3    4    5    6    7    8    9    0    -    =    bspc
+  tab  q    w    f    p    g    j    l    u    y    ;    [    ]    \
+  @cap a    r    s    t    d    h    n    e    i    o    '    ret
+  lsft z    x    c    v    b    k    m    ,    .    /    rsft
+  lctl lmet lalt           spc            ralt rmet menu rctl
+)
+""",
+})
+
+# Special key functions substituted by generate_layout_config(use_special=True)
+_SPECIAL_KEYS = MappingProxyType({
+    "caps": "(tap-hold 200 esc lctl)",  # Caps is Esc when tapped, Ctrl when held
+    "lsft": "(tap-hold-next 200 ( lsft)",  # Shift with tap-hold for parentheses
+    "rsft": "(tap-hold-next 200 ) rsft)",
+})
+
+# Config written by update_config; $device is the selected input device
+_KMONAD_TEMPLATE = string.Template(r"""(defcfg
+  input  (device-file "$device")
+  output (uinput-sink "KMonad: Compyutinator")
+  fallthrough true
+  allow-cmd true
+)
+
+""" + _DEFSRC + r"""
+
+(deflayer default
+  esc  f1   f2   f3   f4   f5   f6   f7   f8   f9   f10  f11  f12
+  grv  1    2    3    4    5    6    7    8    9    0    -    =    bspc
+  tab  q    w    e    r    t    y    u    i    o    p    [    ]    \
+  @cap a    s    d    f    g    h    j    k    l    ;    '    ret
+  lsft z    x    c    v    b    n    m    ,    .    /    rsft
+  lctl lmet lalt           spc            ralt rmet menu rctl
+)""")
+
+@functools.lru_cache(maxsize=32)
+def _render_config(device):
+    """Return the update_config text for a device path."""
+    return _KMONAD_TEMPLATE.substitute(device=device)
+
+def _find_kmonad_pids():
+    """Return the PIDs of running kmonad processes by scanning /proc."""
+    pids = []
+    with os.scandir('/proc') as entries:
+        for entry in entries:
+            if not entry.name.isdigit():
+                continue
+            # Raw fd I/O: just openat/read/close per process, without the
+            # fstat/lseek calls and EOF read a buffered file object adds
+            try:
+                fd = os.open(f'/proc/{entry.name}/comm', os.O_RDONLY)
+            except OSError:
+                continue  # Process exited while scanning
+            try:
+                comm = os.read(fd, 32)  # comm is at most 16 bytes with newline
+            except OSError:
+                continue
+            finally:
+                os.close(fd)
+            if comm == b'kmonad\n':
+                pids.append(int(entry.name))
+    return pids
+
+def _kill_kmonad():
+    """Send SIGTERM to every running kmonad process (like `pkill kmonad`).
+
+    Returns the PIDs that were signalled.
+    """
+    killed = []
+    for pid in _find_kmonad_pids():
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            continue
+        killed.append(pid)
+    return killed
+
+def _describe_path(path):
+    """Describe a file's mode, owner and group like `ls -l`."""
+    st = os.stat(path)
+    try:
+        owner = pwd.getpwuid(st.st_uid).pw_name
+    except KeyError:
+        owner = str(st.st_uid)
+    try:
+        group = grp.getgrgid(st.st_gid).gr_name
+    except KeyError:
+        group = str(st.st_gid)
+    return f"{stat.filemode(st.st_mode)} {owner} {group} {path}"
+
+def _unlink_quietly(path):
+    """Remove path, ignoring files that are already gone."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+@contextlib.contextmanager
+def _updates_paused(widget):
+    """Suspend painting of widget for a bulk change.
+
+    Re-enabling updates repaints the widget once, even if the change raised.
+    """
+    widget.setUpdatesEnabled(False)
+    try:
+        yield
+    finally:
+        widget.setUpdatesEnabled(True)
+
+_kmonad_path = None  # Set by _which_kmonad once the binary is found
+
+def _which_kmonad():
+    """Return the kmonad binary path, remembering it once found."""
+    global _kmonad_path
+    if _kmonad_path is None:
+        _kmonad_path = shutil.which('kmonad')  # Not cached while missing
+    return _kmonad_path
+
+@functools.lru_cache(maxsize=1)
+def _user_groups():
+    """Return the current user's group names like `groups`."""
+    gids = [os.getegid()] + [gid for gid in os.getgroups() if gid != os.getegid()]
+    names = []
+    for gid in gids:
+        try:
+            names.append(grp.getgrgid(gid).gr_name)
+        except KeyError:
+            names.append(str(gid))
+    return " ".join(names)
+
+@dataclass
+class _PreflightResult:
+    """What toggle_kmonad needs to know before starting KMonad."""
+    config_file: str
+    config_size: int
+    kmonad_path: str
+    uinput_permissions: str
+    user_groups: str
+
+class _PreflightSignals(QObject):
+    """Signals carrying a _PreflightTask result back to the GUI thread."""
+
+    done = pyqtSignal(object)  # _PreflightResult
+    failed = pyqtSignal(str)  # error message
+
+class _PreflightTask(QRunnable):
+    """Stop old KMonad instances and check the setup on a QThreadPool worker."""
+
+    def __init__(self, config_file, config_size, signals):
+        super().__init__()
+        self.config_file = config_file  # Already written by the GUI thread
+        self.config_size = config_size
+        self.signals = signals
+
+    def run(self):
+        try:
+            # Kill any existing KMonad processes first
+            _kill_kmonad()
+
+            # Check KMonad installation
+            kmonad_path = _which_kmonad()
+            if kmonad_path is None:
+                raise RuntimeError("KMonad not found in PATH")
+
+            # Check permissions
+            try:
+                uinput_permissions = _describe_path('/dev/uinput')
+            except OSError as e:
+                uinput_permissions = str(e)
+
+            result = _PreflightResult(
+                self.config_file, self.config_size, kmonad_path,
+                uinput_permissions, _user_groups()
+            )
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.done.emit(result)
+
 class KeyboardLayout(QWidget):
     """Widget for displaying and editing keyboard layouts."""
     
+    _terminal_cmd = None  # Resolved on first debug_in_terminal call
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         
@@ -33,6 +321,9 @@ class KeyboardLayout(QWidget):
         # Add staggered layout toggle
         self.offset_toggle = QCheckBox("Staggered Layout")
         self.offset_toggle.setChecked(True)  # Default to staggered
+        # Mirrored so KeyBlock drag handlers don't query the checkbox per event
+        self.staggered = True
+        self.offset_toggle.toggled.connect(self._set_staggered)
         controls_layout.addWidget(self.offset_toggle)
         
         # Add key size controls
@@ -41,21 +332,42 @@ class KeyboardLayout(QWidget):
         self.key_size_spin = QSpinBox()
         self.key_size_spin.setRange(30, 100)
         self.key_size_spin.setValue(50)
-        self.key_size_spin.valueChanged.connect(self.update_key_sizes)
+        # Resize keys once the spin box has settled, not on every step
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(150)
+        self._resize_timer.timeout.connect(self.update_key_sizes)
+        # No-argument start(); valueChanged(int) would pick start(msec) and
+        # replace the interval with the spin value
+        self.key_size_spin.valueChanged.connect(lambda _: self._resize_timer.start())
         key_size_layout.addWidget(self.key_size_spin)
         controls_layout.addLayout(key_size_layout)
         
         # Add config editor
-        self.config_edit = QTextEdit()
+        self.config_edit = QPlainTextEdit()
         self.config_edit.setPlaceholderText("Paste your KMonad config here...")
+        # KMonad configs are column-aligned; don't wrap (or rewrap on resize)
+        self.config_edit.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
         self.main_layout.addWidget(self.config_edit)
         
+        # Reparse edits after a pause in typing rather than per keystroke
+        self._reparse_timer = QTimer(self)
+        self._reparse_timer.setSingleShot(True)
+        self._reparse_timer.setInterval(150)
+        self._reparse_timer.timeout.connect(self._do_parse_config)
+        self.config_edit.textChanged.connect(self._reparse_timer.start)
+        
         # Add output box first so it's available for messages
-        self.output_box = QTextEdit()
+        self.output_box = QPlainTextEdit()
         self.output_box.setReadOnly(True)
         self.output_box.setMinimumHeight(100)
+        # Keep the log bounded so layout cost doesn't grow with session length
+        self.output_box.setMaximumBlockCount(500)
+        self._last_msg = None  # Repeats of this are collapsed by show_warning
+        self._last_msg_count = 0
+        self._last_entry_blocks = 0  # Lines taken by the last show_warning entry
         self.output_box.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #2a2a2a;
                 color: #ff6b6b;
                 border: 1px solid #ff6b6b;
@@ -98,6 +410,12 @@ class KeyboardLayout(QWidget):
         self.minimize_to_tray.setChecked(True)
         button_layout.addWidget(self.minimize_to_tray)
         
+        # KMonad's output (config errors, exit codes) goes to the log by
+        # default; unchecking runs it detached, without a diagnostic channel
+        self.show_kmonad_output = QCheckBox("Show KMonad Output")
+        self.show_kmonad_output.setChecked(True)
+        button_layout.addWidget(self.show_kmonad_output)
+        
         self.main_layout.addLayout(button_layout)
         
         # Add output box at bottom
@@ -105,25 +423,27 @@ class KeyboardLayout(QWidget):
         
         # Initialize after UI is ready
         self.kmonad_process = None
+        self.kmonad_pid = None  # KMonad started outside this app, if any
+        self._preflight_pending = False  # A _PreflightTask is running
+        # Config file handed to KMonad; rewritten only when the text changes
+        # Prefer the per-user runtime directory over the shared /tmp
+        cfg_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+        self._kmonad_cfg_path = os.path.join(cfg_dir, "compyutinator_kmonad.kbd")
+        self._last_cfg_text = None
+        self._debug_script_path = None  # Created on first debug launch
+        self._debug_script_text = None
+        # Notices KMonad's uinput device appearing; only watches while a start is pending
+        self._by_id_watcher = QFileSystemWatcher(self)
+        self._by_id_watcher.directoryChanged.connect(self._on_by_id_changed)
+        self._awaiting_device = False
+        # One restartable deadline, so a stale one can't fire during a later start
+        self._device_deadline = QTimer(self)
+        self._device_deadline.setSingleShot(True)
+        self._device_deadline.setInterval(5000)
+        self._device_deadline.timeout.connect(self._on_device_deadline)
         self.refresh_devices()
         self.load_default_config()
         
-        # Create warning label first
-        self.warning_label = QLabel(self)
-        self.warning_label.setStyleSheet("""
-            QLabel {
-                color: #ff6b6b;
-                background-color: #2a2a2a;
-                border: 1px solid #ff6b6b;
-                border-radius: 4px;
-                padding: 8px;
-                margin: 4px;
-            }
-        """)
-        self.warning_label.hide()
-        # Add warning label to top of layout
-        self.main_layout.insertWidget(0, self.warning_label)
-        
         # Initialize other attributes
         self.dragging = False
         self.drag_source = None
@@ -132,16 +452,11 @@ class KeyboardLayout(QWidget):
         self.row_states = {}
         self.setAcceptDrops(True)
         
-        # Define default layouts
-        self.default_layout = {
-            "Function": ["esc", "f1", "f2", "f3", "f4", "f5", "f6", "f7", "f8", "f9", "f10", "f11", "f12"],
-            "Number": ["grv", "1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "mins", "eql", "bspc"],
-            "QWERTY": ["tab", "q", "w", "e", "r", "t", "y", "u", "i", "o", "p", "lbrc", "rbrc", "bsls"],
-            "Home": ["caps", "a", "s", "d", "f", "g", "h", "j", "k", "l", "scln", "quot", "ret"],
-            "Shift": ["lsft", "z", "x", "c", "v", "b", "n", "m", "comm", "dot", "slsh", "rsft"],
-            "Control": ["lctl", "lmet", "lalt", "spc", "ralt", "rmet", "menu", "rctl"]
-        }
-        
+        # Predefined layouts are shared module constants
+        self.layouts = _LAYOUTS
+        self.default_layout = _LAYOUTS["QWERTY"]
+        self.kmonad_configs = _KMONAD_CONFIGS
+
         # Add layout selector
         layout_selector = QHBoxLayout()
         layout_selector.addWidget(QLabel("Base Layout:"))
@@ -149,17 +464,17 @@ class KeyboardLayout(QWidget):
         self.layout_combo.addItems(["QWERTY", "Colemak", "Dvorak"])
         self.layout_combo.currentTextChanged.connect(self.change_layout)
         layout_selector.addWidget(self.layout_combo)
-        self.main_layout.insertLayout(1, layout_selector)
+        self.main_layout.insertLayout(0, layout_selector)
         
-        # Now create keyboard layout
-        self.create_keyboard_layout()
+        # Key rows are built on first show (see showEvent); until then the
+        # row loops below see empty rows and do nothing
+        self.row_configs = _ROW_CONFIGS
+        self._key_model = []
+        self._rows = []
+        self._layout_built = False
         
         # Add special key functions
-        self.special_keys = {
-            "caps": "(tap-hold 200 esc lctl)",  # Caps is Esc when tapped, Ctrl when held
-            "lsft": "(tap-hold-next 200 ( lsft)",  # Shift with tap-hold for parentheses
-            "rsft": "(tap-hold-next 200 ) rsft)",
-        }
+        self.special_keys = _SPECIAL_KEYS
 
         # Check for existing KMonad process on startup
         self.check_existing_kmonad()
@@ -167,82 +482,35 @@ class KeyboardLayout(QWidget):
         # Add system tray
         self.create_tray_icon()
 
-        # Add predefined layouts
-        self.layouts = {
-            "QWERTY": {
-                "Function": ["esc", "f1", "f2", "f3", "f4", "f5", "f6", "f7", "f8", "f9", "f10", "f11", "f12"],
-                "Number": ["grv", "1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "mins", "eql", "bspc"],
-                "QWERTY": ["tab", "q", "w", "e", "r", "t", "y", "u", "i", "o", "p", "lbrc", "rbrc", "bsls"],
-                "Home": ["caps", "a", "s", "d", "f", "g", "h", "j", "k", "l", "scln", "quot", "ret"],
-                "Shift": ["lsft", "z", "x", "c", "v", "b", "n", "m", "comm", "dot", "slsh", "rsft"],
-                "Control": ["lctl", "lmet", "lalt", "spc", "ralt", "rmet", "menu", "rctl"]
-            },
-            "Colemak": {
-                "Function": ["esc", "f1", "f2", "f3", "f4", "f5", "f6", "f7", "f8", "f9", "f10", "f11", "f12"],
-                "Number": ["grv", "1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "mins", "eql", "bspc"],
-                "QWERTY": ["tab", "q", "w", "f", "p", "g", "j", "l", "u", "y", "scln", "lbrc", "rbrc", "bsls"],
-                "Home": ["caps", "a", "r", "s", "t", "d", "h", "n", "e", "i", "o", "quot", "ret"],
-                "Shift": ["lsft", "z", "x", "c", "v", "b", "k", "m", "comm", "dot", "slsh", "rsft"],
-                "Control": ["lctl", "lmet", "lalt", "spc", "ralt", "rmet", "menu", "rctl"]
-            }
-        }
-
-        # Add default KMonad configs
-        self.kmonad_configs = {
-            "QWERTY-Colemak": """
-(defcfg
-  input  (device-file "/dev/input/by-id/DEVICE_ID")
-  output (uinput-sink "My KMonad output")
-  fallthrough true
-  allow-cmd true
-)
-
-(defsrc
-  esc  f1   f2   f3   f4   f5   f6   f7   f8   f9   f10  f11  f12
-  grv  1    2    3    4    5    6    7    8    9    0    -    =    bspc
-  tab  q    w    e    r    t    y    u    i    o    p    [    ]    \\
-  caps a    s    d    f    g    h    j    k    l    ;    '    ret
-  lsft z    x    c    v    b    n    m    ,    .    /    rsft
-  lctl lmet lalt           spc            ralt rmet menu rctl
-)
-
-(defalias
-  cap (tap-hold 200 esc lctl)
-)
-
-(deflayer colemak
-  esc  f1   f2   f3   f4   f5   f6   f7   f8   f9   f10  f11  f12
-  grv  1    2    3    4    5    6    7    8    9    0    -    =    bspc
-  tab  q    w    f    p    g    j    l    u    y    ;    [    ]    \\
-  @cap a    r    s    t    d    h    n    e    i    o    '    ret
-  lsft z    x    c    v    b    k    m    ,    .    /    rsft
-  lctl lmet lalt           spc            ralt rmet menu rctl
-)
-"""
-        }
-
         # Add row offsets for staggered layout
-        self.row_offsets = {
-            "Function": 0,
-            "Number": 0,
-            "QWERTY": 25,  # Quarter key offset
-            "Home": 35,    # Third key offset
-            "Shift": 45,   # Half key offset
-            "Control": 15  # Small offset
-        }
+        self.row_offsets = _ROW_OFFSETS
 
     def show_warning(self, message, timeout=5000):
         """Show warning message in output box."""
-        from datetime import datetime
-        current = self.output_box.toPlainText()
         timestamp = datetime.now().strftime("%H:%M:%S")
-        new_message = f"[{timestamp}] {message}"
-        
-        if current:
-            new_message = current + "\n" + new_message
-        
-        self.output_box.setText(new_message)
-        self.output_box.moveCursor(QTextCursor.MoveOperation.End)
+        if message == self._last_msg:
+            # Collapse repeats into the last entry instead of flooding the log
+            self._last_msg_count += 1
+            entry = f"[{timestamp}] {message} (x{self._last_msg_count})"
+            # Select the entry by blocks: positions count UTF-16 units, not
+            # code points, and shift when old blocks are trimmed from the top
+            cursor = self.output_box.textCursor()
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.movePosition(
+                QTextCursor.MoveOperation.PreviousBlock, QTextCursor.MoveMode.KeepAnchor,
+                self._last_entry_blocks - 1
+            )
+            cursor.movePosition(
+                QTextCursor.MoveOperation.StartOfBlock, QTextCursor.MoveMode.KeepAnchor
+            )
+            cursor.insertText(entry)
+        else:
+            self._last_msg = message
+            self._last_msg_count = 1
+            entry = f"[{timestamp}] {message}"
+            # appendPlainText() adds a block without re-laying out the existing log
+            self.output_box.appendPlainText(entry)
+        self._last_entry_blocks = entry.count('\n') + 1
 
     def toggle_warning_size(self):
         """Toggle between normal and expanded warning size."""
@@ -258,11 +526,10 @@ class KeyboardLayout(QWidget):
 
     def debug_in_terminal(self):
         """Run KMonad in terminal with debug output."""
+        script_path = self._debug_script_path
         try:
             # Save current config to temp file
-            config_file = os.path.join(tempfile.gettempdir(), "kmonad_debug.kbd")
-            with open(config_file, 'w') as f:
-                f.write(self.config_edit.toPlainText())
+            config_file = self._sync_config_file(self.config_edit.toPlainText())
             
             # Create debug script with more verbose output
             debug_script = f"""#!/bin/bash
@@ -291,34 +558,34 @@ echo
 echo "Press Enter to close..."
 read
 """
-            script_path = os.path.join(tempfile.gettempdir(), "kmonad_debug.sh")
-            with open(script_path, 'w') as f:
-                f.write(debug_script)
-            os.chmod(script_path, 0o755)
-
-            # Try to launch terminal more aggressively
-            terminal_cmds = [
-                ["konsole", "-e", f"bash {script_path}"],
-                ["gnome-terminal", "--", "bash", script_path],
-                ["xterm", "-e", f"bash {script_path}"],
-                ["alacritty", "-e", f"bash {script_path}"]
-            ]
-
-            for cmd in terminal_cmds:
-                try:
-                    subprocess.Popen(cmd)
-                    self.show_warning(f"Launched debug in {cmd[0]}", 5000)
-                    return
-                except FileNotFoundError:
-                    continue
+            script_path = self._debug_script(debug_script)
 
+            # Look up an installed terminal once and reuse it afterwards
+            if KeyboardLayout._terminal_cmd is None:
+                for name, args in _TERMINALS:
+                    path = shutil.which(name)
+                    if path:
+                        KeyboardLayout._terminal_cmd = [path, *args]
+                        break
+
+            if KeyboardLayout._terminal_cmd is None:
+                self.show_warning(
+                    "No terminal found. Install one of:\n"
+                    "- konsole\n"
+                    "- gnome-terminal\n"
+                    "- xterm\n"
+                    "- alacritty",
+                    10000
+                )
+                return
+
+            # Detached, so the terminal is never left as an unreaped child
+            program, *args = self._terminal_cmd
+            ok, _ = QProcess.startDetached(program, [*args, "bash", script_path])
+            if not ok:
+                raise OSError(f"could not start {program}")
             self.show_warning(
-                "No terminal found. Install one of:\n"
-                "- konsole\n"
-                "- gnome-terminal\n"
-                "- xterm\n"
-                "- alacritty",
-                10000
+                f"Launched debug in {os.path.basename(self._terminal_cmd[0])}", 5000
             )
 
         except Exception as e:
@@ -333,76 +600,32 @@ read
         """Refresh the list of available keyboard devices."""
         self.device_combo.clear()
         try:
-            devices = []
-            
-            # Try by-path firstnarst
-            by_path = "/dev/input/by-path"
-            if os.path.exists(by_path):
-                for device in os.listdir(by_path):
-                    if "kbd" in device.lower():
-                        full_path = os.path.join(by_path, device)
-                        real_path = os.path.realpath(full_path)
-                        if os.path.exists(real_path):
-                            # Get device name from /proc/bus/input/devices
-                            with open('/proc/bus/input/devices', 'r') as f:
-                                content = f.read()
-                                event_num = real_path.split('event')[-1]
-                                for block in content.split('\n\n'):
-                                    if f'event{event_num}' in block:
-                                        name = [line for line in block.split('\n') 
-                                               if line.startswith('N: Name=')]
-                                        if name:
-                                            name = name[0].split('"')[1]
-                                            devices.append((
-                                                full_path,  # Use by-path path
-                                                f"{name} ({full_path})",
-                                                'platform' in device
-                                            ))
-
-            # Also check by-id
-            by_id = "/dev/input/by-id"
-            if os.path.exists(by_id):
-                for device in os.listdir(by_id):
-                    if "kbd" in device.lower():
-                        full_path = os.path.join(by_id, device)
-                        real_path = os.path.realpath(full_path)
-                        if os.path.exists(real_path):
-                            # Get device name from /proc/bus/input/devices
-                            with open('/proc/bus/input/devices', 'r') as f:
-                                content = f.read()
-                                event_num = real_path.split('event')[-1]
-                                for block in content.split('\n\n'):
-                                    if f'event{event_num}' in block:
-                                        name = [line for line in block.split('\n') 
-                                               if line.startswith('N: Name=')]
-                                        if name:
-                                            name = name[0].split('"')[1]
-                                            devices.append((
-                                                full_path,  # Use by-id path
-                                                f"{name} ({full_path})",
-                                                False
-                                            ))
+            # Read the device list once and index device names by event number
+            with open('/proc/bus/input/devices', 'rb') as f:
+                content = f.read()
+            # The same pass collects kbd event devices in case no by-* links match
+            event_to_name = {}
+            fallback = []
+            for block in content.split(b'\n\n'):
+                name = _NAME_RE.search(block)
+                handlers = _HANDLERS_RE.search(block)
+                if name and handlers:
+                    name = name.group(1).decode(errors='replace')
+                    is_kbd = b'kbd' in block.lower()
+                    for event_num in _EVENT_RE.findall(handlers.group(1)):
+                        event_num = event_num.decode()
+                        event_to_name[event_num] = name
+                        if is_kbd:
+                            path = f"/dev/input/event{event_num}"
+                            fallback.append((path, f"{name} ({path})", False))
+
+            # Try by-path first, then by-id
+            devices = self._scan_symlink_dir("/dev/input/by-path", event_to_name, True)
+            devices += self._scan_symlink_dir("/dev/input/by-id", event_to_name, False)
 
             # Fallback to direct event devices if needed
             if not devices:
-                with open('/proc/bus/input/devices', 'r') as f:
-                    content = f.read()
-                    for block in content.split('\n\n'):
-                        if 'kbd' in block.lower():
-                            name = [line for line in block.split('\n') 
-                                   if line.startswith('N: Name=')]
-                            handlers = [line for line in block.split('\n') 
-                                      if line.startswith('H: Handlers=')]
-                            if name and handlers:
-                                name = name[0].split('"')[1]
-                                for handler in handlers[0].split('=')[1].split():
-                                    if handler.startswith('event'):
-                                        path = f"/dev/input/{handler}"
-                                        devices.append((
-                                            path,
-                                            f"{name} ({path})",
-                                            False
-                                        ))
+                devices = fallback
 
             if devices:
                 # Sort devices - platform keyboards first, then alphabetically
@@ -428,6 +651,72 @@ read
             self.show_warning(f"Error accessing keyboard devices: {str(e)}", 10000)
             self.device_combo.addItem("Error accessing devices")
 
+    def _scan_symlink_dir(self, dir_path, event_to_name, by_path):
+        """List keyboard symlinks in a /dev/input/by-* directory."""
+        devices = []
+        try:
+            entries = os.scandir(dir_path)
+        except FileNotFoundError:
+            return devices
+        with entries:
+            for entry in entries:
+                name = entry.name
+                if "kbd" not in name.lower() or not entry.is_symlink():
+                    continue
+                # Links point at ../eventN; one readlink instead of realpath + stat
+                event_num = os.readlink(entry.path).rsplit('event', 1)[-1]
+                device_name = event_to_name.get(event_num)
+                if device_name:
+                    devices.append((
+                        entry.path,
+                        f"{device_name} ({entry.path})",
+                        by_path and 'platform' in name
+                    ))
+        return devices
+
+    def _debug_script(self, text):
+        """Return a script file holding text, writing it only when it changed.
+
+        The script only embeds the fixed config path, so after the first
+        launch the existing file is reused as is.
+        """
+        path = self._debug_script_path
+        if path is not None and text == self._debug_script_text and os.path.exists(path):
+            return path
+        if path is None or not os.path.exists(path):
+            fd, path = tempfile.mkstemp(prefix="kmonad_debug_", suffix=".sh")
+            atexit.register(_unlink_quietly, path)
+            self._debug_script_path = path
+        else:
+            fd = os.open(path, os.O_WRONLY | os.O_TRUNC)
+        try:
+            os.write(fd, text.encode())
+            os.fchmod(fd, 0o755)
+        finally:
+            os.close(fd)
+        self._debug_script_text = text
+        return path
+
+    def _sync_config_file(self, text):
+        """Write text to the KMonad config file if it changed; return the path."""
+        path = self._kmonad_cfg_path
+        if text == self._last_cfg_text and os.path.exists(path):
+            return path
+        # Write a fresh temp file beside the target and rename it, so KMonad
+        # never sees a partial file and no predictable name is opened
+        fd, tmp_path = tempfile.mkstemp(
+            prefix="compyutinator_kmonad_", suffix=".tmp", dir=os.path.dirname(path)
+        )
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError:
+            _unlink_quietly(tmp_path)
+            raise
+        self._last_cfg_text = text
+        return path
+
     def update_config(self):
         """Update KMonad config with current layout and device."""
         device = self.device_combo.currentData()  # Get the raw device path
@@ -435,35 +724,10 @@ read
             self.show_warning("No keyboard device selected", 5000)
             return
 
-        config = f"""(defcfg
-  input  (device-file "{device}")
-  output (uinput-sink "KMonad: Compyutinator")
-  fallthrough true
-  allow-cmd true
-)
-
-(defsrc
-  esc  f1   f2   f3   f4   f5   f6   f7   f8   f9   f10  f11  f12
-  grv  1    2    3    4    5    6    7    8    9    0    -    =    bspc
-  tab  q    w    e    r    t    y    u    i    o    p    [    ]    \\
-  caps a    s    d    f    g    h    j    k    l    ;    '    ret
-  lsft z    x    c    v    b    n    m    ,    .    /    rsft
-  lctl lmet lalt           spc            ralt rmet menu rctl
-)
-
-(defalias
-  cap (tap-hold 200 esc lctl)
-)
-
-(deflayer default
-  esc  f1   f2   f3   f4   f5   f6   f7   f8   f9   f10  f11  f12
-  grv  1    2    3    4    5    6    7    8    9    0    -    =    bspc
-  tab  q    w    e    r    t    y    u    i    o    p    [    ]    \\
-  @cap a    s    d    f    g    h    j    k    l    ;    '    ret
-  lsft z    x    c    v    b    n    m    ,    .    /    rsft
-  lctl lmet lalt           spc            ralt rmet menu rctl
-)"""
-        self.config_edit.setText(config)
+        config = _render_config(device)
+        # Re-setting identical text would rebuild the document and reparse it
+        if config != self.config_edit.toPlainText():
+            self.config_edit.setPlainText(config)
 
     def load_config(self):
         """Load KMonad config from file."""
@@ -476,8 +740,9 @@ read
         if filename:
             try:
                 with open(filename, 'r') as f:
-                    self.config_edit.setText(f.read())
-                self.parse_config(self.config_edit.toPlainText())
+                    config_text = f.read()
+                self.config_edit.setPlainText(config_text)
+                self.parse_config(config_text)
             except Exception as e:
                 self.show_warning(f"Error loading config: {str(e)}")
 
@@ -502,170 +767,217 @@ read
             return ""
             
         layout = []
-        for row in range(self.layout.count() - 3):  # Skip device selector and controls
-            row_widget = self.layout.itemAt(row).widget()
-            if isinstance(row_widget, QWidget):
-                row_name = row_widget.property("row_name")
-                row_layout = row_widget.layout()
-                if not row_layout:  # Skip if row layout is not initialized
-                    continue
-                    
-                row_keys = []
-                if use_default and row_name in self.default_layout:
-                    row_keys = self.default_layout[row_name]
-                else:
-                    for i in range(row_layout.count() - 1):  # Skip stretch
-                        key_block = row_layout.itemAt(i).widget()
-                        if isinstance(key_block, KeyBlock):
-                            key = key_block.key if key_block.key != " " else "_"
-                            if use_special and key in self.special_keys:
-                                key = self.special_keys[key]
-                            row_keys.append(key)
-                            
-                if row_keys:  # Only add non-empty rows
-                    layout.append(" ".join(row_keys))
+        special_keys = self.special_keys
+        for config, model_row in zip(self.row_configs, self._key_model):
+            row_name = config["name"]
+            if use_default and row_name in self.default_layout:
+                row_keys = self.default_layout[row_name]
+            else:
+                # Join the model row directly unless keys need rewriting
+                row_keys = model_row
+                if " " in row_keys:  # Blank keys are written as "_"
+                    row_keys = [key if key != " " else "_" for key in row_keys]
+                if use_special:
+                    row_keys = [special_keys.get(key, key) for key in row_keys]
                     
+            if row_keys:  # Only add non-empty rows
+                layout.append(" ".join(row_keys))
+                
         return "\n  ".join(layout)
 
     def create_keyboard_layout(self):
         """Create initial empty keyboard layout."""
-        # Define row configurations with explicit max lengths
-        self.row_configs = [
-            {"name": "Function", "length": 13},
-            {"name": "Number", "length": 14},
-            {"name": "QWERTY", "length": 14},
-            {"name": "Home", "length": 13},
-            {"name": "Shift", "length": 12},
-            {"name": "Control", "length": 8}
-        ]
+        # Row configurations with explicit max lengths
+        self.row_configs = _ROW_CONFIGS
         
-        # Create rows
-        for config in self.row_configs:
-            row_widget = QWidget()
-            row_widget.setProperty("row_name", config["name"])
-            row_widget.setProperty("max_length", config["length"])
-            row_layout = QHBoxLayout(row_widget)
-            row_layout.setSpacing(2)
-            row_layout.setContentsMargins(2, 2, 2, 2)
+        # Build every row before repainting; each row is filled while
+        # detached and only then added to the main layout
+        with _updates_paused(self):
+            # Key names per row; KeyBlocks write their key back into this model
+            self._key_model = []
+            # (row_widget, row_layout, key_blocks) per row, so updates don't
+            # walk the Qt layouts
+            self._rows = []
+            for row_idx, config in enumerate(self.row_configs):
+                row_widget = QWidget()
+                row_widget.setProperty("row_index", row_idx)
+                row_widget.setProperty("row_name", config["name"])
+                row_widget.setProperty("max_length", config["length"])
+                row_layout = QHBoxLayout(row_widget)
+                row_layout.setSpacing(2)
+                row_layout.setContentsMargins(2, 2, 2, 2)
             
-            # Create key blocks with default layout
-            default_keys = self.default_layout[config["name"]]
-            for i in range(config["length"]):
-                key = default_keys[i] if i < len(default_keys) else " "
-                key_block = KeyBlock(key, self)
-                key_block.setText(key)  # Set visible text
-                row_layout.addWidget(key_block)
+                # Create key blocks with default layout
+                default_keys = self.default_layout[config["name"]]
+                model_row = [
+                    default_keys[i] if i < len(default_keys) else " "
+                    for i in range(config["length"])
+                ]
+                self._key_model.append(model_row)
+                key_blocks = []
+                row_offset = self.row_offsets.get(config["name"], 0)
+                for i, key in enumerate(model_row):
+                    key_block = KeyBlock(key, self, model_row, i, key_blocks)
+                    key_block.row_offset = row_offset
+                    row_layout.addWidget(key_block)
+                    key_blocks.append(key_block)
             
-            row_layout.addStretch()
-            self.main_layout.addWidget(row_widget)
+                row_layout.addStretch()
+                self._rows.append((row_widget, row_layout, key_blocks))
+                self.main_layout.addWidget(row_widget)
+        self.updateGeometry()
 
     def toggle_kmonad(self):
         """Toggle KMonad on/off."""
-        if self.kmonad_process is None or self.kmonad_process.state() == QProcess.ProcessState.NotRunning:
+        if self._preflight_pending:
+            return  # The tray action can still call this while a start is pending
+        process_running = (
+            self.kmonad_process is not None
+            and self.kmonad_process.state() != QProcess.ProcessState.NotRunning
+        )
+        if not process_running and self.kmonad_pid is None:
+            # Write the config here so only the GUI thread touches the file
+            config_text = self.config_edit.toPlainText()
             try:
-                # Kill any existing KMonad processes first
-                subprocess.run(['pkill', 'kmonad'], check=False)
-                
-                # Save current config to temp file
-                config_file = os.path.join(tempfile.gettempdir(), "temp_kmonad.kbd")
-                with open(config_file, 'w') as f:
-                    f.write(self.config_edit.toPlainText())
-                
-                # Verify config file exists and contents
-                if not os.path.exists(config_file):
-                    raise RuntimeError(f"Config file not created: {config_file}")
-                with open(config_file) as f:
-                    self.show_warning(f"Config contents:\n{f.read()}")
-
-                # Check KMonad installation
-                which_result = subprocess.run(['which', 'kmonad'], capture_output=True, text=True)
-                if which_result.returncode != 0:
-                    raise RuntimeError("KMonad not found in PATH")
-                kmonad_path = which_result.stdout.strip()
-                self.show_warning(f"Found KMonad at: {kmonad_path}")
-
-                # Check permissions
-                ls_result = subprocess.run(['ls', '-l', '/dev/uinput'], capture_output=True, text=True)
-                self.show_warning(f"uinput permissions:\n{ls_result.stdout}")
-                
-                groups_result = subprocess.run(['groups'], capture_output=True, text=True)
-                self.show_warning(f"Current user groups:\n{groups_result.stdout}")
-
-                # Start KMonad process with full error capture
-                self.kmonad_process = QProcess()
-                self.kmonad_process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
-                
-                # Connect signals
-                self.kmonad_process.readyReadStandardOutput.connect(self.handle_kmonad_output)
-                self.kmonad_process.errorOccurred.connect(self.handle_kmonad_error)
-                self.kmonad_process.finished.connect(self.handle_kmonad_finished)
-                
-                # Start KMonad with debug output
-                cmd = [kmonad_path, "-d", config_file]
-                self.show_warning(f"Starting KMonad: {' '.join(cmd)}")
-                self.kmonad_process.start(kmonad_path, ["-d", config_file])
-                
-                if not self.kmonad_process.waitForStarted(1000):
-                    error = self.kmonad_process.errorString()
-                    raise RuntimeError(f"Failed to start KMonad: {error}")
-                
-                # Wait a bit and check if process is still running
-                QTimer.singleShot(1000, self.check_kmonad_running)
-                
-                self.start_button.setText("Stop KMonad")
-                self.show_warning("KMonad started, checking status...")
-                
-            except Exception as e:
-                self.show_warning(
-                    f"Error starting KMonad: {str(e)}\n"
-                    "Try running debug to troubleshoot",
-                    30000
+                config_file = self._sync_config_file(config_text)
+            except OSError as e:
+                self.show_warning(f"Error writing KMonad config: {str(e)}")
+                return
+            # Run the process checks off the GUI thread; the button stays
+            # disabled until _on_preflight_done/_on_preflight_failed
+            self.start_button.setEnabled(False)
+            self._preflight_pending = True
+            self._preflight_signals = _PreflightSignals()
+            self._preflight_signals.done.connect(self._on_preflight_done)
+            self._preflight_signals.failed.connect(self._on_preflight_failed)
+            QThreadPool.globalInstance().start(
+                _PreflightTask(
+                    config_file,
+                    len(config_text.encode()),
+                    self._preflight_signals
                 )
+            )
         else:
+            # A deliberate stop is not a failed start; don't report one
+            self._stop_awaiting_device()
             try:
-                self.kmonad_process.kill()
-                subprocess.run(['pkill', 'kmonad'], check=False)
+                if process_running:
+                    self.kmonad_process.kill()
+                _kill_kmonad()
+                self.kmonad_pid = None
                 self.show_warning("KMonad stopped")
                 self.start_button.setText("Start KMonad")
             except Exception as e:
                 self.show_warning(f"Error stopping KMonad: {str(e)}")
 
+    def _on_preflight_done(self, result):
+        """Start KMonad once the preflight checks have finished."""
+        self._preflight_pending = False
+        self.start_button.setEnabled(True)
+        self.show_warning(f"Config size: {result.config_size} bytes ({result.config_file})")
+        self.show_warning(f"Found KMonad at: {result.kmonad_path}")
+        self.show_warning(f"uinput permissions:\n{result.uinput_permissions}")
+        self.show_warning(f"Current user groups:\n{result.user_groups}")
+
+        cmd = [result.kmonad_path, "-d", result.config_file]
+        self.show_warning(f"Starting KMonad: {' '.join(cmd)}")
+
+        if not self.show_kmonad_output.isChecked():
+            # Nothing to read, so run KMonad detached and watch its pidfd
+            # rather than pumping its output through the event loop
+            ok, pid = QProcess.startDetached(result.kmonad_path, ["-d", result.config_file])
+            if not ok:
+                self.handle_kmonad_error(QProcess.ProcessError.FailedToStart)
+                return
+            self.kmonad_pid = pid
+            self._watch_exit(pid, self._on_kmonad_exit)
+            self._on_kmonad_started()
+            return
+
+        # Start KMonad process with full error capture
+        self.kmonad_process = QProcess()
+        self.kmonad_process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+        
+        # Connect signals; start failures are reported through errorOccurred
+        self.kmonad_process.started.connect(self._on_kmonad_started)
+        self.kmonad_process.readyReadStandardOutput.connect(self.handle_kmonad_output)
+        self.kmonad_process.errorOccurred.connect(self.handle_kmonad_error)
+        self.kmonad_process.finished.connect(self.handle_kmonad_finished)
+        
+        # Start KMonad with debug output
+        self.kmonad_process.start(result.kmonad_path, ["-d", result.config_file])
+
+    def _on_preflight_failed(self, error):
+        """Report a preflight failure."""
+        self._preflight_pending = False
+        self.start_button.setEnabled(True)
+        self.show_warning(
+            f"Error starting KMonad: {error}\n"
+            "Try running debug to troubleshoot",
+            30000
+        )
+
+    def _on_kmonad_started(self):
+        """Update the UI once the KMonad process has started."""
+        self.start_button.setText("Stop KMonad")
+        self.show_warning("KMonad started, checking status...")
+
+        # React as soon as the device shows up; fall back to a full check if it never does
+        self._awaiting_device = True
+        self._device_deadline.start()
+        if os.path.isdir('/dev/input/by-id'):
+            self._by_id_watcher.addPath('/dev/input/by-id')
+        self._on_by_id_changed()
+
+    def _stop_awaiting_device(self):
+        """Stop watching for the KMonad device; returns whether we were waiting."""
+        was_awaiting = self._awaiting_device
+        self._awaiting_device = False
+        self._device_deadline.stop()
+        dirs = self._by_id_watcher.directories()
+        if dirs:
+            self._by_id_watcher.removePaths(dirs)
+        return was_awaiting
+
+    def _on_by_id_changed(self, path=None):
+        """Report success once KMonad's uinput device appears in /dev/input/by-id."""
+        if not self._awaiting_device:
+            return
+        try:
+            by_id = os.listdir('/dev/input/by-id')
+        except FileNotFoundError:
+            return
+        if any("kmonad" in name.lower() for name in by_id):
+            self._stop_awaiting_device()
+            self.show_warning(
+                "KMonad running and device created\n"
+                "Try typing 'a' - it should output 'b'"
+            )
+
+    def _on_device_deadline(self):
+        """Fall back to a full status check if the device never appeared."""
+        if self._stop_awaiting_device():
+            self.check_kmonad_running()
+
     def check_kmonad_running(self):
         """Check if KMonad is still running after start."""
         try:
             # Check process
-            ps_result = subprocess.run(
-                ['ps', 'aux'], 
-                capture_output=True, 
-                text=True
-            )
-            if "kmonad" not in ps_result.stdout.lower():
-                # KMonad died - check system log
-                journal_result = subprocess.run(
-                    ['journalctl', '-n', '50'], 
-                    capture_output=True, 
-                    text=True
-                )
-                self.show_warning(
-                    "Error: KMonad failed to start\n"
-                    f"System log:\n{journal_result.stdout}\n"
-                    "Common issues:\n"
-                    "1. uinput module not loaded (run 'sudo modprobe uinput')\n"
-                    "2. Permission denied on /dev/uinput\n"
-                    "3. User not in input group\n"
-                    "4. Invalid config syntax\n"
-                    "Try running: kmonad -d /tmp/temp_kmonad.kbd",
-                    0
-                )
+            if not _find_kmonad_pids():
+                # KMonad died - check system log without blocking the UI
+                self.show_warning("KMonad failed to start; fetching system log...")
+                journal = QProcess(self)
+                journal.finished.connect(lambda *_: self._on_journal_finished(journal))
+                journal.errorOccurred.connect(lambda *_: self._on_journal_finished(journal))
+                journal.start('journalctl', ['-n', '50'])
                 return
 
             # Check if device was created
-            ls_result = subprocess.run(
-                ['ls', '-l', '/dev/input/by-id'], 
-                capture_output=True, 
-                text=True
-            )
-            if "kmonad" not in ls_result.stdout.lower():
+            try:
+                by_id = os.listdir('/dev/input/by-id')
+            except FileNotFoundError:
+                by_id = []
+            if not any("kmonad" in name.lower() for name in by_id):
                 self.show_warning(
                     "Warning: KMonad running but device not created\n"
                     "Try typing 'a' - it should output 'b'\n"
@@ -682,6 +994,25 @@ read
         except Exception as e:
             self.show_warning(f"Error checking KMonad: {str(e)}")
 
+    def _on_journal_finished(self, journal):
+        """Report a failed KMonad start along with the system log."""
+        if journal.property("reported"):
+            return  # errorOccurred can follow finished for the same run
+        journal.setProperty("reported", True)
+        log = bytes(journal.readAllStandardOutput()).decode(errors='replace')
+        journal.deleteLater()
+        self.show_warning(
+            "Error: KMonad failed to start\n"
+            f"System log:\n{log or '(journalctl unavailable)'}\n"
+            "Common issues:\n"
+            "1. uinput module not loaded (run 'sudo modprobe uinput')\n"
+            "2. Permission denied on /dev/uinput\n"
+            "3. User not in input group\n"
+            "4. Invalid config syntax\n"
+            f"Try running: kmonad -d {self._kmonad_cfg_path}",
+            0
+        )
+
     def handle_kmonad_output(self):
         """Handle KMonad process output."""
         if self.kmonad_process:
@@ -709,6 +1040,8 @@ read
     def handle_kmonad_finished(self, exit_code, exit_status):
         """Handle KMonad process finishing."""
         self.start_button.setText("Start KMonad")
+        if self._stop_awaiting_device():
+            self.check_kmonad_running()  # Died during startup; report with the journal
         if exit_code != 0:
             self.show_warning(
                 f"KMonad exited with code {exit_code}\n"
@@ -724,34 +1057,71 @@ read
         """Check for existing KMonad processes and update UI accordingly."""
         try:
             # Check for running kmonad processes
-            result = subprocess.run(
-                ['pgrep', '-a', 'kmonad'],
-                capture_output=True,
-                text=True
-            )
+            pids = _find_kmonad_pids()
             
-            if result.stdout:
-                self.kmonad_pid = int(result.stdout.split()[0])
+            if pids:
+                self.kmonad_pid = pids[0]
                 self.start_button.setText("Stop KMonad")
-                # Create process object for existing kmonad
-                self.kmonad_process = QProcess()
-                self.kmonad_process.setProcessId(self.kmonad_pid)
+                # Not our child, so QProcess can't track it; watch a pidfd instead
+                self._watch_exit(self.kmonad_pid, self._on_kmonad_exit)
             else:
                 self.kmonad_pid = None
                 self.start_button.setText("Start KMonad")
                 
-        except subprocess.CalledProcessError:
+        except OSError:
             self.show_warning("Error checking KMonad processes")
 
+    def _on_kmonad_exit(self, pid):
+        """Reset the UI when a detached or adopted KMonad process exits."""
+        if pid != self.kmonad_pid:
+            return  # Already stopped or replaced
+        self.kmonad_pid = None
+        self.start_button.setText("Start KMonad")
+        self.update_tray_status(False)
+        if self._stop_awaiting_device():
+            self.check_kmonad_running()  # Died during startup; report with the journal
+
     def kill_existing_kmonad(self):
         """Kill any existing KMonad processes."""
         try:
-            subprocess.run(['pkill', 'kmonad'], check=True)
+            _kill_kmonad()
             return True
-        except subprocess.CalledProcessError:
+        except OSError:
             self.show_warning("Error killing existing KMonad processes")
             return False
 
+    def _watch_exit(self, pid, callback):
+        """Call callback(pid) from the event loop once pid exits.
+
+        Returns False if the process is already gone or pidfds are not
+        supported (Python < 3.9, Linux < 5.3).
+        """
+        try:
+            fd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            return False
+        # A pidfd becomes readable when the process exits
+        notifier = QSocketNotifier(fd, QSocketNotifier.Type.Read, self)
+
+        def on_exit():
+            notifier.setEnabled(False)
+            notifier.deleteLater()
+            os.close(fd)
+            callback(pid)
+
+        notifier.activated.connect(on_exit)
+        return True
+
+    def showEvent(self, event):
+        """Build the key rows the first time the widget is shown."""
+        if not self._layout_built:
+            self._layout_built = True
+            self.create_keyboard_layout()
+            # Catch the rows up with the config and key size set before now
+            self.parse_config(self.config_edit.toPlainText())
+            self.update_key_sizes()
+        super().showEvent(event)
+
     def closeEvent(self, event):
         """Handle window close event."""
         if self.minimize_to_tray.isChecked():
@@ -767,7 +1137,11 @@ read
     def create_tray_icon(self):
         """Create system tray icon and menu."""
         self.tray_icon = QSystemTrayIcon(self)
-        self.tray_icon.setIcon(QIcon.fromTheme('input-keyboard'))
+        # Look up both theme icons once; update_tray_status just swaps them
+        self._icon_running = QIcon.fromTheme('input-keyboard-virtual-on')
+        self._icon_stopped = QIcon.fromTheme('input-keyboard')
+        self._tray_running = None
+        self.tray_icon.setIcon(self._icon_stopped)
         
         # Create tray menu
         self.tray_menu = QMenu()
@@ -791,15 +1165,18 @@ read
         
     def update_tray_status(self, running=False):
         """Update tray icon tooltip and menu to reflect KMonad status."""
+        if running == self._tray_running:
+            return
+        self._tray_running = running
         if running:
             self.tray_icon.setToolTip("KMonad Running")
             self.toggle_action.setText("Stop KMonad")
             # Optional: change icon to indicate running state
-            self.tray_icon.setIcon(QIcon.fromTheme('input-keyboard-virtual-on'))
+            self.tray_icon.setIcon(self._icon_running)
         else:
             self.tray_icon.setToolTip("KMonad Stopped")
             self.toggle_action.setText("Start KMonad")
-            self.tray_icon.setIcon(QIcon.fromTheme('input-keyboard'))
+            self.tray_icon.setIcon(self._icon_stopped)
 
     def tray_activated(self, reason):
         """Handle tray icon activation."""
@@ -814,7 +1191,7 @@ read
     def quit_application(self):
         """Quit the application."""
         # Optionally kill KMonad before quitting
-        if self.kmonad_process is not None:
+        if self.kmonad_process is not None or self.kmonad_pid is not None:
             reply = QMessageBox.question(
                 self,
                 "Quit",
@@ -828,24 +1205,31 @@ read
         
         QApplication.quit()
 
+    def _set_staggered(self, checked):
+        """Track the staggered layout toggle."""
+        self.staggered = checked
+
     def update_layout(self, state):
         """Update keyboard layout based on offset toggle."""
-        for row_idx in range(self.layout.count() - 3):  # Skip device selector and controls
-            row_widget = self.layout.itemAt(row_idx).widget()
-            if isinstance(row_widget, QWidget):
-                row_layout = row_widget.layout()
-                row_name = row_widget.property("row_name")
-                
-                # Calculate offset for this row
-                offset = self.row_offsets.get(row_name, 0) if state else 0
-                
+        # Find rows whose offset or state actually changes
+        pending = []
+        for row_idx, (config, row) in enumerate(zip(self.row_configs, self._rows)):
+            # Calculate offset for this row
+            offset = self.row_offsets.get(config["name"], 0) if state else 0
+            row_state = self.row_states.get(row_idx)
+            if row_state and row_state['offset'] == offset and row_state['active'] == state:
+                continue
+            pending.append((row_idx, row, offset))
+        if not pending:
+            return
+        
+        # Apply all row margins, then repaint once
+        with _updates_paused(self):
+            for row_idx, (row_widget, row_layout, _), offset in pending:
                 # Update margin to create offset
                 row_layout.setContentsMargins(offset, 2, 2, 2)
                 row_widget.setContentsMargins(offset, 2, 2, 2)  # Also update widget margins
-                
-                # Force layout update
                 row_widget.updateGeometry()
-                self.update()
                 
                 # Store state for this row
                 self.row_states[row_idx] = {
@@ -853,59 +1237,45 @@ read
                     'active': state
                 }
 
+    def _do_parse_config(self):
+        """Parse the editor contents once typing has paused."""
+        self.parse_config(self.config_edit.toPlainText())
+
     def parse_config(self, config_text):
         """Parse KMonad config and update layout."""
+        # Callers that parse right after setPlainText() make the pending reparse redundant
+        self._reparse_timer.stop()
         try:
             # Find the deflayer section
-            layer_match = re.search(r'\(deflayer\s+default\s+([\s\S]+?)\)', config_text)
+            layer_match = _DEFLAYER_RE.search(config_text)
             if not layer_match:
                 return
                 
-            layout_text = layer_match.group(1)
-            rows = layout_text.strip().split('\n')
+            # The pattern skips leading whitespace, and split() with no
+            # argument ignores the rest, so no strip() copies are needed
+            rows = layer_match.group(1).split('\n')
             
-            # Update key blocks
-            for row_idx, row in enumerate(rows):
-                if row_idx >= self.layout.count() - 3:  # Skip device selector and controls
-                    break
-                    
-                row_widget = self.layout.itemAt(row_idx).widget()
-                if isinstance(row_widget, QWidget):
-                    row_layout = row_widget.layout()
-                    keys = row.strip().split()
-                    
-                    for key_idx, key in enumerate(keys):
-                        if key_idx >= row_layout.count() - 1:  # Skip stretch
-                            break
-                            
-                        key_block = row_layout.itemAt(key_idx).widget()
-                        if isinstance(key_block, KeyBlock):
-                            # Handle special key mappings
-                            if key in self.special_keys:
-                                key = key.strip('()')  # Remove parentheses from aliases
-                            key_block.key = key
-                            key_block.setText(key)
+            # Update key blocks; zip stops at the shorter of rows/keys. Only
+            # changed keys are repainted (Qt merges their update() calls)
+            special_keys = self.special_keys
+            for row, (_, _, key_blocks) in zip(rows, self._rows):
+                for key, key_block in zip(row.split(), key_blocks):
+                    # Handle special key mappings; only strip when there are parentheses
+                    if key.startswith('(') and key in special_keys:
+                        key = key.strip('()')  # Remove parentheses from aliases
+                    if key_block.key != key:
+                        # Share one string per key name with the layout tables
+                        key_block.setText(sys.intern(key))
                             
         except Exception as e:
             self.show_warning(f"Error parsing config: {str(e)}")
 
     def get_layout_config(self):
         """Get current layout configuration."""
-        layout = []
-        for row_idx in range(self.layout.count() - 3):  # Skip device selector and controls
-            row_widget = self.layout.itemAt(row_idx).widget()
-            if isinstance(row_widget, QWidget):
-                row_layout = row_widget.layout()
-                row_keys = []
-                
-                for key_idx in range(row_layout.count() - 1):  # Skip stretch
-                    key_block = row_layout.itemAt(key_idx).widget()
-                    if isinstance(key_block, KeyBlock):
-                        row_keys.append(key_block.key)
-                        
-                layout.append(row_keys)
-                
-        return layout
+        return [
+            [key_block.key for key_block in key_blocks]
+            for _, _, key_blocks in self._rows
+        ]
 
     def change_layout(self, layout_name):
         """Change keyboard layout."""
@@ -915,7 +1285,7 @@ read
             self.update_visual_layout()
             # Update config
             if layout_name == "Colemak":
-                self.config_edit.setText(
+                self.config_edit.setPlainText(
                     self.kmonad_configs["QWERTY-Colemak"].replace(
                         "DEVICE_ID", 
                         self.device_combo.currentText()
@@ -923,27 +1293,35 @@ read
 
     def update_visual_layout(self):
         """Update visual layout with current mapping."""
-        for row_idx in range(self.layout.count() - 3):
-            row_widget = self.layout.itemAt(row_idx).widget()
-            if isinstance(row_widget, QWidget):
-                row_name = row_widget.property("row_name")
-                if row_name in self.default_layout:
-                    row_layout = row_widget.layout()
-                    keys = self.default_layout[row_name]
-                    for key_idx, key in enumerate(keys):
-                        if key_idx < row_layout.count() - 1:
-                            key_block = row_layout.itemAt(key_idx).widget()
-                            if isinstance(key_block, KeyBlock):
-                                key_block.key = key
-                                key_block.setText(key)
+        # Only changed keys are repainted (Qt merges their update() calls)
+        for config, (_, _, key_blocks) in zip(self.row_configs, self._rows):
+            keys = self.default_layout.get(config["name"])
+            if keys:
+                for key, key_block in zip(keys, key_blocks):
+                    if key_block.key != key:
+                        key_block.setText(key)
 
     def kill_all_kmonad(self):
         """Kill all running KMonad processes."""
         try:
-            subprocess.run(['pkill', 'kmonad'], check=False)
-            self.show_warning("Killed all KMonad processes")
+            pids = _kill_kmonad()
         except Exception as e:
             self.show_warning(f"Error killing KMonad: {str(e)}")
+            return
+
+        # Report once every signalled process has actually exited
+        pending = set(pids)
+
+        def exited(pid):
+            pending.discard(pid)
+            if not pending:
+                self.show_warning("Killed all KMonad processes")
+
+        for pid in pids:
+            if not self._watch_exit(pid, exited):
+                pending.discard(pid)
+        if not pending:
+            self.show_warning("Killed all KMonad processes")
 
     def load_default_config(self):
         """Load default KMonad config."""
@@ -967,7 +1345,7 @@ read
 (deflayer default
   b
 )"""
-        self.config_edit.setText(default_config)
+        self.config_edit.setPlainText(default_config)
         self.show_warning(
             "Loaded test config - 'a' should type as 'b'\n"
             "Try typing 'a' to test if KMonad is working",
@@ -996,33 +1374,50 @@ read
         """Get the index of a row in the keyboard layout."""
         parent = row_layout.parent()
         if parent:
-            main_layout = parent.parent().layout()
-            for i in range(main_layout.count()):
-                if main_layout.itemAt(i).widget() == parent:
-                    return i
+            return parent.property("row_index") or 0
         return 0
 
     def update_key_sizes(self):
         """Update the size of all key widgets."""
-        size = self.key_size_spin.value()
-        for row in self.findChildren(QWidget, "keyboard_row"):
-            for key in row.findChildren(KeyBlock):
-                key.setFixedSize(size, size)
+        value = self.key_size_spin.value()
+        size = QSize(value, value)
+        # Backgrounds for the old size are never drawn again; drop them
+        KeyBlock._background_cache.clear()
+        # Resize all keys, then repaint once rather than per key
+        with _updates_paused(self):
+            for _, _, key_blocks in self._rows:
+                for key in key_blocks:
+                    key.setFixedSize(size)
 
 class KeyBlock(QWidget):
     """A custom widget representing a keyboard key."""
     
     is_dragging = False
     dragged_key = None  # Class variable to track currently dragged key
-
-    def __init__(self, key, parent=None):
+    _drop_target = None  # Key that last received a dragMoveEvent
+    _key_font = None  # Font for key labels, set on first paint
+    _static_text_cache = {}  # Key name -> QStaticText laid out in _key_font
+    _background_cache = {}  # (width, height, ratio, bg, border) -> QPixmap
+    # Paint objects that never change, built once rather than per paint
+    _TEXT_COLOR = QColor("white")
+    _PLACEHOLDER_TEXT_COLOR = QColor("#404040")
+    _DROP_PEN = QPen(QColor("#90ff90"), 4)
+
+    def __init__(self, key, parent=None, model_row=None, col=None, row_keys=()):
         super().__init__(parent)
+        self.model_row = model_row  # Row list in KeyboardLayout._key_model
+        self.col = col
+        self.row_keys = row_keys  # KeyBlocks of this row, in layout order
+        self.row_offset = 0  # Stagger offset of this row, set by create_keyboard_layout
+        # Owning layout; rows reparent keys, so parent() is only the row widget
+        self.keyboard_layout = parent if isinstance(parent, KeyboardLayout) else None
         self.key = key
         self.original_key = key
         self.is_placeholder = False
         self.is_target = False
         self.is_neighbor = False
         self.drop_side = None  # 'left' or 'right' or None
+        self._drag_pixmap = None  # ((key, size), QPixmap) from the last drag
         self.setFixedSize(50, 50)
         self.setText(key)
         self.setAcceptDrops(True)
@@ -1032,6 +1427,18 @@ class KeyBlock(QWidget):
         self.animation = QPropertyAnimation(self, b"pos")
         self.animation.setDuration(150)
         self.animation.setEasingCurve(QEasingCurve.Type.OutQuad)
+        self._anim_target = None  # End position of the running animation
+        self.animation.finished.connect(self._on_animation_finished)
+
+    @property
+    def key(self):
+        return self._key
+
+    @key.setter
+    def key(self, value):
+        self._key = value
+        if self.model_row is not None:
+            self.model_row[self.col] = value
 
     def paintEvent(self, event):
         painter = QPainter(self)
@@ -1039,54 +1446,69 @@ class KeyBlock(QWidget):
         
         # Set colors based on state
         if self.is_placeholder:
-            bg_color = QColor("#1a1a1a")
-            text_color = QColor("#404040")
-            border_color = QColor("#2a2a2a")
+            bg_color = "#1a1a1a"
+            text_color = KeyBlock._PLACEHOLDER_TEXT_COLOR
+            border_color = "#2a2a2a"
         else:
-            bg_color = QColor("#2a2a2a")
-            text_color = QColor("white")
-            border_color = QColor("#3a3a3a")
+            bg_color = "#2a2a2a"
+            text_color = KeyBlock._TEXT_COLOR
+            border_color = "#3a3a3a"
             
             if self.is_target and KeyBlock.is_dragging:
-                bg_color = QColor("#3a5a3a")
-                border_color = QColor("#4a6a4a")
+                bg_color = "#3a5a3a"
+                border_color = "#4a6a4a"
             elif self.is_target:
                 # Subtle highlight when just hovering
-                bg_color = QColor("#2d2d2d")
-                border_color = QColor("#3d3d3d")
+                bg_color = "#2d2d2d"
+                border_color = "#3d3d3d"
             elif self.is_neighbor and KeyBlock.is_dragging:
-                bg_color = QColor("#2a3a2a")
-                border_color = QColor("#3a5a3a")
+                bg_color = "#2a3a2a"
+                border_color = "#3a5a3a"
         
-        # Draw background
-        painter.fillRect(self.rect(), bg_color)
-        
-        # Draw border with drop indicators
-        pen = QPen(border_color)
-        pen.setWidth(2)
-        painter.setPen(pen)
+        # Draw background and border from a pixmap shared by same-sized keys
+        width, height = self.width(), self.height()
+        ratio = self.devicePixelRatioF()
+        cache_key = (width, height, ratio, bg_color, border_color)
+        background = KeyBlock._background_cache.get(cache_key)
+        if background is None:
+            background = QPixmap(round(width * ratio), round(height * ratio))
+            background.setDevicePixelRatio(ratio)
+            background.fill(QColor(bg_color))
+            bg_painter = QPainter(background)
+            bg_painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            pen = QPen(QColor(border_color))
+            pen.setWidth(2)
+            bg_painter.setPen(pen)
+            bg_painter.drawRoundedRect(QRectF(0, 0, width, height).adjusted(1, 1, -1, -1), 4, 4)
+            bg_painter.end()
+            KeyBlock._background_cache[cache_key] = background
+        painter.drawPixmap(0, 0, background)
         
+        # Draw drop indicators
         if self.drop_side == 'left':
-            left_pen = QPen(QColor("#90ff90"))
-            left_pen.setWidth(4)
-            painter.setPen(left_pen)
-            painter.drawLine(0, 0, 0, self.height())
-            painter.setPen(pen)
+            painter.setPen(KeyBlock._DROP_PEN)
+            painter.drawLine(0, 0, 0, height)
         elif self.drop_side == 'right':
-            right_pen = QPen(QColor("#90ff90"))
-            right_pen.setWidth(4)
-            painter.setPen(right_pen)
-            painter.drawLine(self.width()-1, 0, self.width()-1, self.height())
-            painter.setPen(pen)
-        
-        painter.drawRoundedRect(self.rect().adjusted(1, 1, -1, -1), 4, 4)
+            painter.setPen(KeyBlock._DROP_PEN)
+            painter.drawLine(width-1, 0, width-1, height)
         
-        # Draw text
+        # Draw text; the layout of each key name is computed once
+        if KeyBlock._key_font is None:
+            KeyBlock._key_font = QFont(self.font())
+            KeyBlock._key_font.setPointSize(10)
+        label = "" if self.is_placeholder else self.key
+        text = KeyBlock._static_text_cache.get(label)
+        if text is None:
+            text = QStaticText(label)
+            text.prepare(QTransform(), KeyBlock._key_font)
+            KeyBlock._static_text_cache[label] = text
         painter.setPen(text_color)
-        font = painter.font()
-        font.setPointSize(10)
-        painter.setFont(font)
-        painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, self.key)
+        painter.setFont(KeyBlock._key_font)
+        text_size = text.size()
+        painter.drawStaticText(
+            QPointF((width - text_size.width()) / 2, (height - text_size.height()) / 2),
+            text
+        )
 
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton and not self.is_placeholder:
@@ -1112,20 +1534,22 @@ class KeyBlock(QWidget):
         mimeData.setText(self.key)
         drag.setMimeData(mimeData)
 
-        # Create semi-transparent drag pixmap
-        pixmap = QPixmap(self.size())
-        pixmap.fill(Qt.GlobalColor.transparent)
-        self.render(pixmap)
-        painter = QPainter(pixmap)
-        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_DestinationIn)
-        painter.fillRect(pixmap.rect(), QColor(0, 0, 0, 127))
-        painter.end()
-        drag.setPixmap(pixmap)
+        # Create semi-transparent drag pixmap, reused until the key or size changes
+        cache_key = (self.key, self.size())
+        if self._drag_pixmap is None or self._drag_pixmap[0] != cache_key:
+            pixmap = QPixmap(self.size())
+            pixmap.fill(Qt.GlobalColor.transparent)
+            self.render(pixmap)
+            painter = QPainter(pixmap)
+            painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_DestinationIn)
+            painter.fillRect(pixmap.rect(), QColor(0, 0, 0, 127))
+            painter.end()
+            self._drag_pixmap = (cache_key, pixmap)
+        drag.setPixmap(self._drag_pixmap[1])
         drag.setHotSpot(event.pos())
 
-        # Set placeholder state
+        # Set placeholder state; the key itself (and its model column) is kept
         self.is_placeholder = True
-        self.key = ""
         self.update()
 
         # Execute drag
@@ -1134,45 +1558,52 @@ class KeyBlock(QWidget):
         # Reset states
         KeyBlock.is_dragging = False
         KeyBlock.dragged_key = None
+        KeyBlock._drop_target = None
 
-        if result == Qt.DropAction.IgnoreAction:
+        # A swap onto another key already cleared this; drops elsewhere did not
+        if self.is_placeholder:
             self.is_placeholder = False
-            self.key = self.original_key
             self.update()
 
     def dragEnterEvent(self, event):
+        self._half_w = self.width() >> 1  # Drop-side split used by dragMoveEvent
         if event.mimeData().hasText() and KeyBlock.is_dragging:
             event.accept()
             parent_row = self.parent()
             if parent_row:
                 row_layout = parent_row.layout()
                 self.spreadRow(row_layout)
-                self.is_target = True
-                self.update()
+                if not self.is_target:
+                    self.is_target = True
+                    self.update()
 
     def dragMoveEvent(self, event):
         """Handle drag move events."""
         if event.mimeData().hasText():
             event.accept()
-            # Update target state
-            self.is_target = True
-            # Use position() instead of pos() for QDragMoveEvent
-            mouse_x = event.position().x()
-            self.drop_side = 'right' if mouse_x > self.width() / 2 else 'left'
+            # Use position() instead of pos() for QDragMoveEvent; only
+            # repaint when the target state or drop side actually changes
+            side = 'right' if event.position().x() > self._half_w else 'left'
+            changed = side != self.drop_side or not self.is_target
+            self.drop_side = side
             
             # Update row spreading based on drop position
             parent_row = self.parent()
             if parent_row:
                 row_layout = parent_row.layout()
-                # Clear other targets in row
-                for i in range(row_layout.count() - 1):
-                    key = row_layout.itemAt(i).widget()
-                    if isinstance(key, KeyBlock) and key != self:
-                        key.is_target = False
-                        key.drop_side = None
+                # Clear the previous drop target; it is the only other key
+                # that can carry a drop side
+                previous = KeyBlock._drop_target
+                if previous is not None and previous is not self:
+                    if previous.is_target or previous.drop_side:
+                        previous.is_target = False
+                        previous.drop_side = None
+                        previous.update()
+                KeyBlock._drop_target = self
                 # Update current target
                 self.is_target = True
-                self.update()
+                if changed:
+                    self.update()
                 # Only spread row if we're actually dragging a key
                 if KeyBlock.is_dragging:
                     self.spreadRow(row_layout)
@@ -1202,7 +1633,7 @@ class KeyBlock(QWidget):
             source = event.source()
             if source != self:
                 # Handle key swap
-                new_key = event.mimeData().text()
+                new_key = sys.intern(event.mimeData().text())
                 if self.is_placeholder:
                     self.is_placeholder = False
                     self.key = new_key
@@ -1259,6 +1690,8 @@ class KeyBlock(QWidget):
     
     def get_keyboard_layout(self):
         """Find the KeyboardLayout parent widget."""
+        if self.keyboard_layout is not None:
+            return self.keyboard_layout
         parent = self.parent()
         while parent:
             if isinstance(parent, KeyboardLayout):
@@ -1287,9 +1720,10 @@ class KeyBlock(QWidget):
                     KeyBlock.dragged_key.is_placeholder = False
                     KeyBlock.dragged_key.update()
                 self.spreadRow(row_layout)
-                self.is_target = True
-                self.update()
-        else:
+                if not self.is_target:
+                    self.is_target = True
+                    self.update()
+        elif not self.is_target:
             # Just update appearance without spreading if not dragging
             self.is_target = True
             self.update()
@@ -1300,9 +1734,10 @@ class KeyBlock(QWidget):
         if parent_row and KeyBlock.is_dragging:
             row_layout = parent_row.layout()
             self.resetRow(row_layout)
-        self.is_target = False
-        self.drop_side = None
-        self.update()
+        if self.is_target or self.drop_side:
+            self.is_target = False
+            self.drop_side = None
+            self.update()
 
     def spreadRow(self, row_layout):
         """Spread keys in row to accommodate dragged key."""
@@ -1311,79 +1746,76 @@ class KeyBlock(QWidget):
             return
             
         spacing = 20  # Spread spacing
-        target_index = row_layout.indexOf(self)
-        
-        # Get current row offset (for staggered layout)
-        row_widget = row_layout.parent()
-        keyboard_layout = row_widget.parent()
-        is_staggered = keyboard_layout.offset_toggle.isChecked()
+        target_index = self.col
         
         # Get stagger offset if in staggered mode
-        base_offset = 0
-        if is_staggered:
-            row_name = row_widget.property("row_name")
-            base_offset = keyboard_layout.row_offsets.get(row_name, 0)
+        base_offset = self.row_offset if self.get_keyboard_layout().staggered else 0
+        step = self.width() + 2  # Every key in a row has the same size
         
         # Calculate positions
-        for i in range(row_layout.count() - 1):
-            key = row_layout.itemAt(i).widget()
-            if isinstance(key, KeyBlock):
-                if key.is_placeholder:
-                    continue
-                
-                # Calculate base position with stagger
-                new_x = base_offset + (i * (key.width() + 2))  # Base position
-                
-                # Add spreading space when dragging
-                if i > target_index:
-                    new_x += spacing  # Make room for dragged key
-                
-                # Move key
-                current_pos = key.pos()
-                if current_pos.x() != new_x:
-                    key.animate_to(QPoint(new_x, current_pos.y()))
-                
-                # Update visual state
-                key.is_target = (i == target_index)
-                key.is_neighbor = abs(i - target_index) == 1
+        for i, key in enumerate(self.row_keys):
+            if key.is_placeholder:
+                continue
+            
+            # Calculate base position with stagger
+            new_x = base_offset + i * step  # Base position
+            
+            # Add spreading space when dragging
+            if i > target_index:
+                new_x += spacing  # Make room for dragged key
+            
+            # Move key
+            current_pos = key.pos()
+            if current_pos.x() != new_x:
+                key.animate_to(QPoint(new_x, current_pos.y()))
+            
+            # Update visual state; drag moves re-run this constantly, so
+            # only keys whose highlight changes are repainted
+            is_target = i == target_index
+            is_neighbor = abs(i - target_index) == 1
+            if key.is_target != is_target or key.is_neighbor != is_neighbor:
+                key.is_target = is_target
+                key.is_neighbor = is_neighbor
                 key.update()
 
     def resetRow(self, row_layout):
         """Reset row to normal spacing."""
         # Get stagger offset
-        row_widget = row_layout.parent()
-        keyboard_layout = row_widget.parent()
-        is_staggered = keyboard_layout.offset_toggle.isChecked()
-        
-        base_offset = 0
-        if is_staggered:
-            row_name = row_widget.property("row_name")
-            base_offset = keyboard_layout.row_offsets.get(row_name, 0)
+        base_offset = self.row_offset if self.get_keyboard_layout().staggered else 0
         
         normal_spacing = 2  # Normal spacing between keys
-        for i in range(row_layout.count() - 1):
-            key = row_layout.itemAt(i).widget()
-            if isinstance(key, KeyBlock):
-                # Reset to original position with stagger
-                new_x = base_offset + (i * (key.width() + normal_spacing))
-                current_pos = key.pos()
-                if current_pos.x() != new_x:
-                    key.animate_to(QPoint(new_x, current_pos.y()))
-                # Reset visual state
+        step = self.width() + normal_spacing  # Every key in a row has the same size
+        for i, key in enumerate(self.row_keys):
+            # Reset to original position with stagger
+            new_x = base_offset + i * step
+            current_pos = key.pos()
+            if current_pos.x() != new_x:
+                key.animate_to(QPoint(new_x, current_pos.y()))
+            # Reset visual state
+            if key.is_neighbor:
                 key.is_neighbor = False
                 key.update()
 
     def setText(self, text):
         """Set the text of the key block."""
         self.key = text
+        self.update()
         
 
     def animate_to(self, new_pos):
         """Animate key block to new position."""
-        if self.pos() == new_pos:
+        # Drag moves re-request the same targets; skip anything within a
+        # pixel of where the key is, or is already heading
+        target = self._anim_target if self._anim_target is not None else self.pos()
+        if (target - new_pos).manhattanLength() < 2:
             return
         
+        self._anim_target = new_pos
         self.animation.stop()
         self.animation.setStartValue(self.pos())
         self.animation.setEndValue(new_pos)
-        self.animation.start()
\ No newline at end of file
+        self.animation.start()
+
+    def _on_animation_finished(self):
+        """Forget the target once the key has arrived."""
+        self._anim_target = None
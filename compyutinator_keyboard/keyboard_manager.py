@@ -67,6 +67,13 @@ except ImportError:
     from compyutinator_transcriber.transcriber import TranscriberWindow
     from .morse_code import MorseChart, MorseRecognizer
 
+# Body of the colemak layer, read by toggle_midi
+_COLEMAK_LAYER_RE = re.compile(r'\(deflayer\s+colemak\s+([\s\S]+?)\)')
+
+# Layout keys toggle_midi leaves unmapped: modifiers and punctuation
+_MIDI_HOME_SKIP = frozenset({'@cap', ';', "'", 'ret'})
+_MIDI_TOP_SKIP = frozenset({'tab', '[', ']', '\\'})
+
 # Add this constant near the top of the file
 KEYBOARD_ICON_SVG = """
 <svg width="64" height="64" viewBox="0 0 64 64" xmlns="http://www.w3.org/2000/svg">
@@ -265,7 +272,7 @@ class KeyboardManager(QMainWindow):
         """Load default KMonad config or restore saved config."""
         saved_config = self.settings.value("last_config")
         if saved_config:
-            self.keyboard_layout.config_edit.setText(saved_config)
+            self.keyboard_layout.config_edit.setPlainText(saved_config)
         else:
             # Default KMonad config
             default_config = """
@@ -298,18 +305,17 @@ class KeyboardManager(QMainWindow):
   lctl lmet lalt           spc            ralt rmet menu rctl
 )
 """
-            # Try to find a keyboard device
+            # Try to find a keyboard device; the link names are all we need
             try:
-                result = subprocess.run(['ls', '-l', '/dev/input/by-id'], capture_output=True, text=True)
-                for line in result.stdout.splitlines():
-                    if 'kbd' in line.lower():
-                        device = line.split(' -> ')[0].strip()
-                        default_config = default_config.replace("DEVICE_ID", device)
-                        break
-            except:
+                with os.scandir('/dev/input/by-id') as entries:
+                    for entry in entries:
+                        if 'kbd' in entry.name.lower():
+                            default_config = default_config.replace("DEVICE_ID", entry.name)
+                            break
+            except OSError:
                 pass
             
-            self.keyboard_layout.config_edit.setText(default_config)
+            self.keyboard_layout.config_edit.setPlainText(default_config)
             self.keyboard_layout.parse_config(default_config)
 
     def toggle_midi(self, enabled: bool):
@@ -322,7 +328,7 @@ class KeyboardManager(QMainWindow):
                 config_text = self.keyboard_layout.config_edit.toPlainText()
                 
                 # Parse the Colemak layer to get key mappings
-                colemak_match = re.search(r'\(deflayer\s+colemak\s+([\s\S]+?)\)', config_text)
+                colemak_match = _COLEMAK_LAYER_RE.search(config_text)
                 if colemak_match:
                     colemak_layout = colemak_match.group(1).strip().split()
                     
@@ -332,31 +338,19 @@ class KeyboardManager(QMainWindow):
                     top_row_start = 14   # Index where 'q' starts in the layout
                     top_row = colemak_layout[top_row_start:top_row_start+10]     # Get 'qwfpgjluy'
                     
-                    # Map keys to notes in piano order
-                    key_map = {}
-                    
-                    # White keys: C D E F G A B C
-                    white_keys = []
-                    for key in home_row:
-                        if key not in ['@cap', ';', "'", 'ret']:  # Skip modifiers and punctuation
-                            white_keys.append(key)
-                    white_keys.extend([key for key in top_row if key not in ['tab', '[', ']', '\\']])
-                    white_notes = [60, 62, 64, 65, 67, 69, 71, 72]  # C4 to C5
-                    
                     # Black keys: C# D# F# G# A#
-                    black_keys = []
-                    for key in top_row:
-                        if key not in ['tab', '[', ']', '\\']:  # Skip modifiers
-                            black_keys.append(key)
+                    black_keys = [key for key in top_row if key not in _MIDI_TOP_SKIP]
                     black_notes = [61, 63, 66, 68, 70]  # C#4 to A#4
                     
-                    # Map white keys first
-                    for key, note in zip(white_keys[:8], white_notes):  # Limit to 8 white keys
-                        key_map[key.lower()] = note
+                    # White keys: C D E F G A B C
+                    white_keys = [key for key in home_row if key not in _MIDI_HOME_SKIP]
+                    white_keys += black_keys  # Same filtered top row
+                    white_notes = [60, 62, 64, 65, 67, 69, 71, 72]  # C4 to C5
                     
-                    # Then map black keys
-                    for key, note in zip(black_keys[:5], black_notes):  # Limit to 5 black keys
-                        key_map[key.lower()] = note
+                    # Map keys to notes in piano order: white keys first, then
+                    # black keys (zip keeps at most 8 white and 5 black)
+                    key_map = {key.lower(): note for key, note in zip(white_keys, white_notes)}
+                    key_map.update((key.lower(), note) for key, note in zip(black_keys, black_notes))
                     
                     self.midi_keyboard.update_key_map(key_map)
                 
@@ -481,6 +475,10 @@ class SetupWizard(QWizard):
         
         # Allow skipping if already configured
         self.setOption(QWizard.WizardOption.IndependentPages, True)
+        
+        # Privileged setup steps, run together in one pkexec call on finish
+        self._pending_commands = {}
+        self._rules_tmp = None  # Queued udev rules file, removed on cancel
     
     def create_intro_page(self):
         """Create introduction page."""
@@ -679,7 +677,9 @@ class SetupWizard(QWizard):
             return False
 
     def setup_udev_rules(self):
-        """Set up udev rules for keyboard and uinput access."""
+        """Queue the udev rules for keyboard and uinput access."""
+        if 'udev' in self._pending_commands:
+            return True
         try:
             # Create more comprehensive udev rules
             rules_content = """# KMonad keyboard access
@@ -688,60 +688,100 @@ KERNEL=="event*", NAME="input/%k", MODE="0660", GROUP="input"
 # Tag all keyboard devices
 SUBSYSTEM=="input", KERNEL=="event*", ENV{ID_INPUT_KEYBOARD}=="1", TAG+="kmonad-keyboards"
 """
-            # Use pkexec to write rules with elevated privileges
+            # Written unprivileged now, copied into place by apply_pending_setup
             with tempfile.NamedTemporaryFile(mode='w', suffix='.rules', delete=False) as temp:
                 temp.write(rules_content)
                 rules_path = temp.name
-            
-            subprocess.run([
-                'pkexec', 'sh', '-c',
-                f'''
-                cp {rules_path} /etc/udev/rules.d/99-kmonad-keyboards.rules
-                udevadm control --reload-rules
-                udevadm trigger
-                '''
-            ], check=True)
-            
-            # Verify rules were created
-            if os.path.exists('/etc/udev/rules.d/99-kmonad-keyboards.rules'):
-                self.udev_status.setText("✓ udev rules configured successfully")
-                return True
-            else:
-                self.udev_status.setText("Error: Rules file not created")
-                return False
-                
-        except Exception as e:
+            self._rules_tmp = rules_path
+        except OSError as e:
             self.udev_status.setText(f"Error configuring udev rules: {e}")
             return False
+        
+        self._pending_commands['udev'] = (
+            f'cp {rules_path} /etc/udev/rules.d/99-kmonad-keyboards.rules'
+            ' && udevadm control --reload-rules'
+            ' && udevadm trigger'
+            f' && rm -f {rules_path}'
+        )
+        self.udev_status.setText("udev rules will be installed when setup finishes")
+        self.udev_button.setEnabled(False)
+        return True
 
     def setup_permissions(self):
-        """Set up user permissions and groups."""
+        """Queue the user permission and group changes."""
+        username = os.getenv('USER')
+        self._pending_commands['perms'] = (
+            # Add user to input group
+            f'usermod -aG input {username}'
+            # Ensure /dev/uinput has correct permissions
+            ' && chgrp input /dev/uinput'
+            ' && chmod g+rw /dev/uinput'
+        )
+        self.perm_status.setText("Permissions will be configured when setup finishes")
+        self.perm_button.setEnabled(False)
+        return True
+
+    def apply_pending_setup(self):
+        """Run every queued step in a single pkexec call, so the user authenticates once."""
+        steps = self._pending_commands
         try:
-            username = os.getenv('USER')
-            subprocess.run([
-                'pkexec', 'sh', '-c',
-                f'''
-                # Add user to input group
-                usermod -aG input {username}
-                
-                # Ensure /dev/uinput has correct permissions
-                chgrp input /dev/uinput
-                chmod g+rw /dev/uinput
-                '''
-            ], check=True)
-            
-            # Verify group membership
-            groups = subprocess.check_output(['groups', username]).decode()
-            if 'input' in groups:
-                self.perm_status.setText("✓ Permissions configured successfully")
-                return True
+            subprocess.run(['pkexec', 'sh', '-c', ' && '.join(steps.values())], check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            # Steps stay queued, so finishing again retries them
+            if 'udev' in steps:
+                self.udev_status.setText(f"Error configuring udev rules: {e}")
+            if 'perms' in steps:
+                self.perm_status.setText(f"Error configuring permissions: {e}")
+            QMessageBox.warning(self, "Setup Failed", f"System setup failed: {e}")
+            return False
+        
+        self._pending_commands = {}
+        self._rules_tmp = None  # Removed by the pkexec batch
+        
+        # Verify what was applied; a failed step can be set up again from its page
+        errors = []
+        if 'udev' in steps:
+            if os.path.exists('/etc/udev/rules.d/99-kmonad-keyboards.rules'):
+                self.udev_status.setText("✓ udev rules configured successfully")
             else:
-                self.perm_status.setText("Error: User not added to input group")
-                return False
-                
-        except Exception as e:
-            self.perm_status.setText(f"Error configuring permissions: {e}")
+                self.udev_status.setText("Error: Rules file not created")
+                self.udev_button.setEnabled(True)
+                errors.append("udev rules file was not created")
+        if 'perms' in steps:
+            try:
+                groups = subprocess.check_output(['groups', os.getenv('USER')]).decode()
+            except (OSError, TypeError, subprocess.CalledProcessError) as e:
+                self.perm_status.setText(f"Could not check group membership: {e}")
+                self.perm_button.setEnabled(True)
+                errors.append(f"could not check group membership: {e}")
+            else:
+                if 'input' in groups:
+                    self.perm_status.setText("✓ Permissions configured successfully")
+                else:
+                    self.perm_status.setText("Error: User not added to input group")
+                    self.perm_button.setEnabled(True)
+                    errors.append("user was not added to the input group")
+        if errors:
+            QMessageBox.warning(self, "Setup Incomplete", "Setup failed:\n" + "\n".join(errors))
             return False
+        return True
+
+    def accept(self):
+        """Apply the queued system changes before closing."""
+        if self._pending_commands and not self.apply_pending_setup():
+            return  # Stay open so setup can be retried or cancelled
+        super().accept()
+
+    def reject(self):
+        """Discard queued setup steps, removing the temporary rules file."""
+        if self._rules_tmp is not None:
+            try:
+                os.unlink(self._rules_tmp)
+            except OSError:
+                pass
+            self._rules_tmp = None
+        self._pending_commands = {}
+        super().reject()
 
     def validateCurrentPage(self):
         """Validate each page before proceeding."""